@@ -6,27 +6,55 @@ This script allows processing multiple search queries and combining results into
 """
 
 import argparse
-import csv
 import os
 import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict
-import pandas as pd
-from pubmed_fetcher import PubMedFetcher
+from typing import Dict, Iterable, Iterator, List
+from pubmed_fetcher import SEARCH_CONFIG, PubMedFetcher, write_papers_csv
+
+
+# Column order for the combined CSV file
+BATCH_COLUMNS = ['pmid', 'title', 'authors', 'journal', 'publication_date',
+                 'affiliations', 'abstract', 'search_query', 'query_name',
+                 'has_pharma_affiliation', 'processed_date']
+
+
+def _prefixed_log(prefix: str):
+    """
+    Build a log function that tags every line with ``prefix``, so lines from
+    concurrently running queries can be told apart.
+    
+    Args:
+        prefix: Tag written at the start of each non-blank line
+        
+    Returns:
+        Function taking a message, suitable for PubMedFetcher.with_log()
+    """
+    def log(message: str = ''):
+        lines = str(message).split('\n')
+        # A single write keeps each message intact when threads log at once
+        sys.stdout.write(''.join(f"{prefix} {line}\n" if line else "\n" for line in lines))
+    
+    return log
 
 
 class BatchProcessor:
     """Process multiple PubMed search queries and combine results."""
     
-    def __init__(self, email: str):
+    def __init__(self, email: str, api_key: str = None,
+                 cache_file: str = SEARCH_CONFIG.get('cache_file')):
         """
         Initialize the batch processor.
         
         Args:
             email: Email address for NCBI E-utilities
+            api_key: Optional NCBI API key for higher rate limits
+            cache_file: SQLite file caching paper XML across runs (None disables the cache)
         """
         self.email = email
-        self.fetcher = PubMedFetcher(email)
+        self.fetcher = PubMedFetcher(email, api_key, cache_file)
         self.all_results = []
     
     def process_query(self, query: str, max_results: int = 50, query_name: str = None) -> List[Dict]:
@@ -41,55 +69,74 @@ class BatchProcessor:
         Returns:
             List of papers with pharma/biotech affiliations
         """
-        print(f"\n{'='*60}")
-        if query_name:
-            print(f"Processing Query: {query_name}")
-        print(f"Search Term: {query}")
-        print(f"Max Results: {max_results}")
-        print(f"{'='*60}")
+        return list(self.iter_query(query, max_results, query_name))
+    
+    def iter_query(self, query: str, max_results: int = 50, query_name: str = None) -> Iterator[Dict]:
+        """
+        Process a single query, yielding papers as they are fetched.
         
-        papers = self.fetcher.fetch_and_filter_papers(query, max_results)
+        Args:
+            query: Search query
+            max_results: Maximum number of results to process
+            query_name: Optional name for the query (for tracking)
+            
+        Yields:
+            Papers with pharma/biotech affiliations
+        """
+        yield from self._iter_query(self.fetcher, query, max_results, query_name)
+    
+    def _iter_query(self, fetcher: PubMedFetcher, query: str, max_results: int,
+                    query_name: str = None) -> Iterator[Dict]:
+        """Process a single query with the given fetcher, reporting progress through its log."""
+        fetcher.log(f"\n{'='*60}")
+        if query_name:
+            fetcher.log(f"Processing Query: {query_name}")
+        fetcher.log(f"Search Term: {query}")
+        fetcher.log(f"Max Results: {max_results}")
+        fetcher.log(f"{'='*60}")
         
         # Add query information to each paper
-        for paper in papers:
+        for paper in fetcher.iter_filtered_papers(query, max_results):
             paper['search_query'] = query
             paper['query_name'] = query_name or query
-        
-        return papers
+            yield paper
     
-    def process_queries_from_file(self, queries_file: str, max_results_per_query: int = 50) -> List[Dict]:
+    def read_queries_file(self, queries_file: str) -> List[str]:
         """
-        Process queries from a text file.
+        Read queries from a text file, skipping blank lines and comments.
         
         Args:
             queries_file: Path to file containing queries (one per line)
-            max_results_per_query: Maximum results per query
             
         Returns:
-            Combined list of all papers
+            List of queries
         """
         if not os.path.exists(queries_file):
             print(f"Error: Queries file '{queries_file}' not found.")
             return []
         
-        all_papers = []
-        
         try:
             with open(queries_file, 'r', encoding='utf-8') as f:
                 queries = [line.strip() for line in f if line.strip() and not line.startswith('#')]
-            
-            print(f"Found {len(queries)} queries in file: {queries_file}")
-            
-            for i, query in enumerate(queries, 1):
-                print(f"\nProcessing query {i}/{len(queries)}")
-                papers = self.process_query(query, max_results_per_query, f"Query_{i}")
-                all_papers.extend(papers)
-                
         except Exception as e:
             print(f"Error reading queries file: {e}")
             return []
         
-        return all_papers
+        print(f"Found {len(queries)} queries in file: {queries_file}")
+        return queries
+    
+    def process_queries_from_file(self, queries_file: str, max_results_per_query: int = 50) -> List[Dict]:
+        """
+        Process queries from a text file.
+        
+        Args:
+            queries_file: Path to file containing queries (one per line)
+            max_results_per_query: Maximum results per query
+            
+        Returns:
+            Combined list of all papers
+        """
+        return self.process_queries_from_list(self.read_queries_file(queries_file), max_results_per_query)
     
     def process_queries_from_list(self, queries: List[str], max_results_per_query: int = 50) -> List[Dict]:
         """
@@ -102,85 +149,116 @@ class BatchProcessor:
         Returns:
             Combined list of all papers
         """
-        all_papers = []
+        return list(self.iter_queries(queries, max_results_per_query))
+    
+    def iter_queries(self, queries: List[str], max_results_per_query: int = 50) -> Iterator[Dict]:
+        """
+        Process a list of queries concurrently, yielding papers query by query
+        in the order the queries were given.
+        
+        All workers share the fetcher's rate limiter, so the combined request
+        rate stays under NCBI's cap. When queries run concurrently, each one's
+        log lines are tagged with its query name.
+        
+        Args:
+            queries: List of search queries
+            max_results_per_query: Maximum results per query
+            
+        Yields:
+            Papers from all queries
+        """
+        max_workers = max(1, min(SEARCH_CONFIG.get('max_concurrent_queries', 4), len(queries)))
         
-        for i, query in enumerate(queries, 1):
-            print(f"\nProcessing query {i}/{len(queries)}")
-            papers = self.process_query(query, max_results_per_query, f"Query_{i}")
-            all_papers.extend(papers)
+        def run_query(i, query):
+            query_name = f"Query_{i}"
+            fetcher = self.fetcher
+            if max_workers > 1:
+                fetcher = fetcher.with_log(_prefixed_log(f"[{query_name}]"))
+            fetcher.log(f"\nProcessing query {i}/{len(queries)}")
+            return list(self._iter_query(fetcher, query, max_results_per_query, query_name))
         
-        return all_papers
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                (query, executor.submit(run_query, i, query))
+                for i, query in enumerate(queries, 1)
+            ]
+            # Collect in submission order; later queries keep running meanwhile
+            for query, future in futures:
+                try:
+                    papers = future.result()
+                except Exception as e:
+                    print(f"Error processing query '{query}': {e}")
+                    continue
+                yield from papers
     
-    def export_combined_results(self, papers: List[Dict], output_file: str):
+    def export_combined_results(self, papers: Iterable[Dict], output_file: str) -> int:
         """
-        Export combined results to CSV with additional metadata.
+        Export combined results to CSV with additional metadata, writing each
+        paper as it arrives.
         
         Args:
-            papers: List of all papers
+            papers: List or iterator of all papers
             output_file: Output CSV filename
+            
+        Returns:
+            Number of papers exported
         """
-        if not papers:
-            print("No papers to export")
-            return
+        processed_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        query_counts = Counter()
+        journal_counts = Counter()
+        year_counts = Counter()
+        
+        def tagged(papers):
+            for paper in papers:
+                paper['processed_date'] = processed_date
+                query_counts[paper.get('query_name', '')] += 1
+                journal_counts[paper.get('journal', '')] += 1
+                year_counts[paper.get('publication_date', '')[:4]] += 1
+                yield paper
         
         try:
-            df = pd.DataFrame(papers)
-            
-            # Add timestamp
-            df['processed_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Reorder columns for better readability
-            columns = ['pmid', 'title', 'authors', 'journal', 'publication_date', 
-                      'affiliations', 'abstract', 'search_query', 'query_name', 
-                      'has_pharma_affiliation', 'processed_date']
-            
-            # Only include columns that exist in the dataframe
-            available_columns = [col for col in columns if col in df.columns]
-            df = df[available_columns]
-            
-            df.to_csv(output_file, index=False, quoting=csv.QUOTE_ALL)
-            print(f"\nExported {len(papers)} papers to {output_file}")
-            
-            # Print summary statistics
-            self.print_summary_statistics(df)
-            
+            count = write_papers_csv(tagged(papers), output_file, BATCH_COLUMNS)
         except Exception as e:
             print(f"Error exporting to CSV: {e}")
+            return 0
+        
+        if not count:
+            print("No papers to export")
+            return 0
+        
+        print(f"\nExported {count} papers to {output_file}")
+        
+        # Print summary statistics
+        self.print_summary_statistics(count, query_counts, journal_counts, year_counts)
+        return count
     
-    def print_summary_statistics(self, df: pd.DataFrame):
+    def print_summary_statistics(self, total: int, query_counts: Counter,
+                                 journal_counts: Counter, year_counts: Counter):
         """
         Print summary statistics for the results.
         
         Args:
-            df: DataFrame containing the results
+            total: Total number of papers exported
+            query_counts: Papers per query name
+            journal_counts: Papers per journal
+            year_counts: Papers per publication year
         """
         print(f"\n{'='*60}")
         print("SUMMARY STATISTICS")
         print(f"{'='*60}")
-        print(f"Total papers found: {len(df)}")
+        print(f"Total papers found: {total}")
         
-        if 'query_name' in df.columns:
-            print(f"\nPapers per query:")
-            query_counts = df['query_name'].value_counts()
-            for query, count in query_counts.items():
-                print(f"  {query}: {count} papers")
+        print(f"\nPapers per query:")
+        for query, count in query_counts.most_common():
+            print(f"  {query}: {count} papers")
         
-        if 'journal' in df.columns:
-            print(f"\nTop journals:")
-            journal_counts = df['journal'].value_counts().head(10)
-            for journal, count in journal_counts.items():
-                print(f"  {journal}: {count} papers")
+        print(f"\nTop journals:")
+        for journal, count in journal_counts.most_common(10):
+            print(f"  {journal}: {count} papers")
         
-        if 'publication_date' in df.columns:
-            print(f"\nPublication years:")
-            # Extract year from publication date
-            try:
-                df['year'] = df['publication_date'].str[:4]
-                year_counts = df['year'].value_counts().sort_index()
-                for year, count in year_counts.items():
-                    print(f"  {year}: {count} papers")
-            except:
-                pass
+        print(f"\nPublication years:")
+        for year, count in sorted(year_counts.items()):
+            print(f"  {year}: {count} papers")
 
 
 def main():
@@ -207,6 +285,12 @@ Examples:
         help='Email address for NCBI E-utilities (required by NCBI)'
     )
     
+    parser.add_argument(
+        '-k', '--api-key',
+        default=os.environ.get('NCBI_API_KEY'),
+        help='NCBI API key for higher rate limits (default: $NCBI_API_KEY)'
+    )
+    
     parser.add_argument(
         '-f', '--file',
         help='File containing search queries (one per line)'
@@ -231,6 +315,12 @@ Examples:
         help='Maximum number of results per query (default: 50)'
     )
     
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the local paper cache'
+    )
+    
     args = parser.parse_args()
     
     # Validate arguments
@@ -243,22 +333,20 @@ Examples:
         sys.exit(1)
     
     # Create processor
-    processor = BatchProcessor(args.email)
+    cache_file = None if args.no_cache else SEARCH_CONFIG.get('cache_file')
+    processor = BatchProcessor(args.email, args.api_key, cache_file)
     
     print("=" * 60)
     print("PubMed Batch Processor")
     print("Processing Multiple Queries for Pharmaceutical/Biotech Affiliations")
     print("=" * 60)
     
-    # Process queries
-    if args.file:
-        papers = processor.process_queries_from_file(args.file, args.max_results_per_query)
-    else:
-        papers = processor.process_queries_from_list(args.queries, args.max_results_per_query)
+    # Process queries, writing papers to the CSV as they are fetched
+    queries = processor.read_queries_file(args.file) if args.file else args.queries
+    papers = processor.iter_queries(queries, args.max_results_per_query)
     
     # Export results
-    if papers:
-        processor.export_combined_results(papers, args.output)
+    if processor.export_combined_results(papers, args.output):
         print(f"\nBatch processing completed successfully!")
         print(f"Results saved to: {args.output}")
     else:
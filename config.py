@@ -96,9 +96,17 @@ ACADEMIC_INDUSTRY_KEYWORDS = {
 # Configuration for search behavior
 SEARCH_CONFIG = {
     'default_max_results': 100,
-    'rate_limit_delay': 0.1,  # seconds between requests
+    'efetch_batch_size': 200,  # PMIDs per EFetch request
+    'max_requests_per_second': 3,  # NCBI limit without an API key
+    'api_key_max_requests_per_second': 10,  # NCBI limit with an API key
+    'max_concurrent_requests': 2,  # parallel EFetch batches without an API key
+    'api_key_max_concurrent_requests': 8,  # parallel EFetch batches with an API key
+    'max_concurrent_queries': 4,  # queries run in parallel by the batch processor
+    'prefilter_affiliations': True,  # screen affiliations via compact MEDLINE records before fetching full XML
+    'cache_file': '.pubmed_cache.db',  # local paper cache (None to disable)
     'timeout': 30,  # seconds for API requests
-    'max_retries': 3,  # number of retries for failed requests
+    'max_retries': 5,  # number of retries for throttled (429) or failed requests
+    'retry_backoff_factor': 0.5,  # exponential backoff between retries, in seconds
 }
 
 # Output configuration
@@ -8,14 +8,31 @@ Results are exported as a CSV file.
 """
 
 import argparse
+import copy
 import csv
+import functools
+import gzip
+import os
 import re
+import sqlite3
 import sys
+import threading
 import time
-from typing import List, Dict, Optional, Set
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from Bio import Entrez
+from lxml import etree
+
+try:
+    import ahocorasick
+except ImportError:
+    # pyahocorasick is optional; fall back to a compiled regex alternation
+    ahocorasick = None
 
 # Import configuration
 try:
@@ -42,34 +59,364 @@ except ImportError:
     }
     COLLABORATION_KEYWORDS = set()
     ACADEMIC_INDUSTRY_KEYWORDS = set()
-    SEARCH_CONFIG = {'default_max_results': 100, 'rate_limit_delay': 0.1, 'timeout': 30, 'max_retries': 3}
+    SEARCH_CONFIG = {'default_max_results': 100, 'efetch_batch_size': 200, 'max_requests_per_second': 3, 'api_key_max_requests_per_second': 10, 'max_concurrent_requests': 2, 'api_key_max_concurrent_requests': 8, 'max_concurrent_queries': 4, 'prefilter_affiliations': True, 'cache_file': '.pubmed_cache.db', 'timeout': 30, 'max_retries': 5, 'retry_backoff_factor': 0.5}
     OUTPUT_CONFIG = {'default_filename': 'pubmed_results.csv', 'csv_encoding': 'utf-8', 'include_abstract': True, 'include_affiliations': True, 'truncate_long_fields': True, 'max_field_length': 1000}
 
 
+EFETCH_URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi'
+
+# PMID and affiliation (AD) fields of MEDLINE text records, including
+# wrapped continuation lines (indented by six spaces)
+MEDLINE_FIELD_RE = re.compile(r'^(PMID|AD) *- (.*(?:\n {6}.*)*)', re.MULTILINE)
+MEDLINE_CONTINUATION_RE = re.compile(r'\s*\n {6}')
+
+
+def _build_automaton(keywords: Set[str]):
+    """Compile keywords into a single Aho-Corasick automaton, or None if pyahocorasick is missing."""
+    if ahocorasick is None or not keywords:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword.lower(), keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_pattern(keywords: Set[str]):
+    """Compile keywords into a single regex alternation, longest keywords first."""
+    alternatives = sorted((re.escape(keyword.lower()) for keyword in keywords), key=len, reverse=True)
+    return re.compile('|'.join(alternatives))
+
+
+@functools.lru_cache(maxsize=8)
+def _keyword_matcher(keywords: FrozenSet[str]):
+    """
+    Build a memoized affiliation matcher for a keyword set.
+    
+    Matchers are cached per distinct keyword set, so each automaton (or regex
+    alternation, when pyahocorasick is not installed) is compiled once and
+    every affiliation is scanned in a single pass. Institutions repeat across
+    papers, so each matcher also memoizes its results by lowercased affiliation.
+    
+    Args:
+        keywords: Keywords to look for
+        
+    Returns:
+        Function taking a lowercased affiliation and returning True on a keyword hit
+    """
+    automaton = _build_automaton(keywords)
+    pattern = _build_pattern(keywords) if automaton is None and keywords else None
+    
+    @functools.lru_cache(maxsize=100_000)
+    def affiliation_hit(affiliation_lower: str) -> bool:
+        if automaton is not None:
+            return next(automaton.iter(affiliation_lower), None) is not None
+        if pattern is not None:
+            return pattern.search(affiliation_lower) is not None
+        return False
+    
+    return affiliation_hit
+
+
+# Column order for exported CSV files
+PAPER_COLUMNS = ['pmid', 'title', 'authors', 'journal', 'publication_date',
+                 'affiliations', 'abstract', 'has_pharma_affiliation']
+
+
+def write_papers_csv(papers: Iterable[Dict], output_file: str, columns: List[str],
+                     encoding: str = 'utf-8') -> int:
+    """
+    Stream papers to a CSV file one row at a time.
+    
+    The file is only created once the first paper arrives, so an empty
+    iterator leaves no output behind.
+    
+    Args:
+        papers: List or iterator of paper dictionaries
+        output_file: Output CSV filename
+        columns: Columns to write, in order (extra keys are ignored)
+        encoding: Output file encoding
+        
+    Returns:
+        Number of papers written
+    """
+    count = 0
+    fh = None
+    
+    try:
+        for paper in papers:
+            if fh is None:
+                fh = open(output_file, 'w', newline='', encoding=encoding, buffering=1 << 20)
+                writer = csv.writer(fh, quoting=csv.QUOTE_MINIMAL)
+                writer.writerow(columns)
+            writer.writerow([paper.get(column, '') for column in columns])
+            count += 1
+    finally:
+        if fh is not None:
+            fh.close()
+    
+    return count
+
+
+# XPath expressions for PubmedArticle fields, compiled once and evaluated in
+# libxml2; plain (non-smart) strings avoid keeping parsed trees alive
+PMID_XP = etree.XPath('string(MedlineCitation/PMID)', smart_strings=False)
+TITLE_XP = etree.XPath('string(MedlineCitation/Article/ArticleTitle)', smart_strings=False)
+ABSTRACT_XP = etree.XPath('MedlineCitation/Article/Abstract/AbstractText')
+JOURNAL_XP = etree.XPath('string(MedlineCitation/Article/Journal/Title)', smart_strings=False)
+YEAR_XP = etree.XPath('string(MedlineCitation/Article/Journal/JournalIssue/PubDate/Year)', smart_strings=False)
+MONTH_XP = etree.XPath('string(MedlineCitation/Article/Journal/JournalIssue/PubDate/Month)', smart_strings=False)
+DAY_XP = etree.XPath('string(MedlineCitation/Article/Journal/JournalIssue/PubDate/Day)', smart_strings=False)
+AUTHOR_XP = etree.XPath('MedlineCitation/Article/AuthorList/Author')
+LAST_NAME_XP = etree.XPath('string(LastName)', smart_strings=False)
+FORE_NAME_XP = etree.XPath('string(ForeName)', smart_strings=False)
+AUTHOR_AFFILIATION_XP = etree.XPath('MedlineCitation/Article/AuthorList/Author/AffiliationInfo/Affiliation')
+ARTICLE_AFFILIATION_XP = etree.XPath('MedlineCitation/Article/Affiliation')
+
+
+def _element_text(elem) -> str:
+    """Return all text inside an XML element, including text in inline markup such as <i>."""
+    if elem is None:
+        return ''
+    return ''.join(elem.itertext())
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces out requests to stay under a requests-per-second cap."""
+    
+    def __init__(self, max_per_second: float):
+        """
+        Initialize the rate limiter.
+        
+        Args:
+            max_per_second: Maximum number of requests allowed per second
+        """
+        self._interval = 1.0 / max_per_second
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+    
+    def wait(self):
+        """Block until the caller is allowed to issue its next request."""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PaperCache:
+    """
+    SQLite cache shared across runs, keyed by PMID: gzipped PubmedArticle XML
+    for fetched papers, and the MEDLINE affiliation (AD) strings of papers
+    screened by the affiliation prefilter.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path: Path to the SQLite cache file
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (pmid INTEGER PRIMARY KEY, xml BLOB)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS affiliations (pmid INTEGER PRIMARY KEY, ad TEXT)")
+        self._conn.commit()
+    
+    def _select_many(self, query: str, pmids: List[str]) -> List[Tuple]:
+        """Run a ``pmid IN (...)`` query (``{}`` marks the placeholders) over chunks of PMIDs."""
+        rows = []
+        pmid_iter = iter(pmids)
+        
+        with self._lock:
+            while True:
+                # Stay well below SQLite's limit on bound parameters
+                chunk = list(islice(pmid_iter, 500))
+                if not chunk:
+                    break
+                rows += self._conn.execute(
+                    query.format(','.join('?' * len(chunk))),
+                    [int(pmid) for pmid in chunk]
+                )
+        
+        return rows
+    
+    def get_many(self, pmids: List[str]) -> Dict[str, bytes]:
+        """
+        Look up cached articles.
+        
+        Args:
+            pmids: List of PubMed IDs
+            
+        Returns:
+            Dictionary mapping each cached PMID to its PubmedArticle XML
+            (corrupt entries are left out, so they are fetched and stored again)
+        """
+        found = {}
+        for pmid, xml in self._select_many("SELECT pmid, xml FROM cache WHERE pmid IN ({})", pmids):
+            try:
+                found[str(pmid)] = gzip.decompress(xml)
+            except (OSError, EOFError, zlib.error):
+                continue
+        return found
+    
+    def put_many(self, articles: List[Tuple[str, bytes]]):
+        """
+        Store articles in the cache.
+        
+        Args:
+            articles: List of (PMID, PubmedArticle XML) tuples
+        """
+        rows = [(int(pmid), gzip.compress(xml)) for pmid, xml in articles]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO cache (pmid, xml) VALUES (?, ?)", rows)
+            self._conn.commit()
+    
+    def get_affiliations(self, pmids: List[str]) -> Dict[str, List[str]]:
+        """
+        Look up cached MEDLINE affiliations.
+        
+        Args:
+            pmids: List of PubMed IDs
+            
+        Returns:
+            Dictionary mapping each screened PMID to its affiliation strings
+        """
+        return {
+            str(pmid): ad.split('\n') if ad else []
+            for pmid, ad in self._select_many("SELECT pmid, ad FROM affiliations WHERE pmid IN ({})", pmids)
+        }
+    
+    def put_affiliations(self, affiliations: Dict[str, List[str]]):
+        """
+        Store MEDLINE affiliations in the cache.
+        
+        Args:
+            affiliations: Dictionary mapping PMIDs to their affiliation strings
+        """
+        rows = [(int(pmid), '\n'.join(ads)) for pmid, ads in affiliations.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO affiliations (pmid, ad) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+
+class _KeywordSet:
+    """
+    Keyword set attribute of PubMedFetcher.
+    
+    Values are stored as frozensets, so a set can only be changed by assigning
+    a new one (e.g. ``fetcher.company_keywords = fetcher.company_keywords | {'acme'}``),
+    and each assignment makes the fetcher rebuild its affiliation matcher.
+    """
+    
+    def __set_name__(self, owner, name):
+        self._attr = '_' + name
+    
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return getattr(obj, self._attr)
+    
+    def __set__(self, obj, value):
+        setattr(obj, self._attr, frozenset(value))
+        obj._matcher = None
+
+
 class PubMedFetcher:
     """Fetches and filters PubMed research papers for pharmaceutical/biotech affiliations."""
     
-    def __init__(self, email: str):
+    pharma_keywords = _KeywordSet()
+    company_keywords = _KeywordSet()
+    collaboration_keywords = _KeywordSet()
+    academic_industry_keywords = _KeywordSet()
+    
+    def __init__(self, email: str, api_key: Optional[str] = None,
+                 cache_file: Optional[str] = SEARCH_CONFIG.get('cache_file')):
         """
         Initialize the PubMed fetcher.
         
         Args:
             email: Email address for NCBI E-utilities (required by NCBI)
+            api_key: Optional NCBI API key (raises the rate limit to 10 requests/second)
+            cache_file: SQLite file caching paper XML across runs (None disables the cache)
         """
         Entrez.email = email
+        self.api_key = api_key
+        if api_key:
+            Entrez.api_key = api_key
+            max_per_second = SEARCH_CONFIG.get('api_key_max_requests_per_second', 10)
+            self.max_workers = SEARCH_CONFIG.get('api_key_max_concurrent_requests', 8)
+        else:
+            max_per_second = SEARCH_CONFIG.get('max_requests_per_second', 3)
+            self.max_workers = SEARCH_CONFIG.get('max_concurrent_requests', 2)
+        
+        # Shared by every request made through this fetcher, including
+        # concurrent EFetch batches
+        self.rate_limiter = RateLimiter(max_per_second)
+        self.cache = PaperCache(cache_file) if cache_file else None
+        
+        # Reports progress and errors; replace it to redirect or tag messages
+        self.log = print
+        
+        # EFetch goes through a pooled session so every batch reuses an open
+        # HTTPS connection instead of repeating the TCP/TLS handshake. Throttled
+        # (429) or failed requests are retried with backoff, honouring Retry-After.
+        pool_size = self.max_workers * SEARCH_CONFIG.get('max_concurrent_queries', 4)
+        retry = Retry(
+            total=SEARCH_CONFIG.get('max_retries', 5),
+            status_forcelist=[429, 500, 502, 503, 504],
+            backoff_factor=SEARCH_CONFIG.get('retry_backoff_factor', 0.5),
+            respect_retry_after_header=True
+        )
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size, max_retries=retry)
+        self._session.mount('https://', adapter)
+        self._eutils_params = {'tool': Entrez.tool, 'email': email}
+        if api_key:
+            self._eutils_params['api_key'] = api_key
+        
         self.pharma_keywords = PHARMA_KEYWORDS
         self.company_keywords = COMPANY_KEYWORDS
         self.collaboration_keywords = COLLABORATION_KEYWORDS
         self.academic_industry_keywords = ACADEMIC_INDUSTRY_KEYWORDS
-        
-        # Combine all keywords for comprehensive detection
-        self.all_keywords = (
-            self.pharma_keywords | 
-            self.company_keywords | 
-            self.collaboration_keywords | 
+    
+    @property
+    def all_keywords(self) -> FrozenSet[str]:
+        """All keywords currently used for affiliation matching."""
+        return frozenset().union(
+            self.pharma_keywords,
+            self.company_keywords,
+            self.collaboration_keywords,
             self.academic_industry_keywords
         )
     
+    def _affiliation_matcher(self):
+        """Return the matcher for the fetcher's keyword sets, building it on first use."""
+        if self._matcher is None:
+            self._matcher = _keyword_matcher(self.all_keywords)
+        return self._matcher
+    
+    def with_log(self, log: Callable[[str], None]) -> 'PubMedFetcher':
+        """
+        Get a fetcher that reports progress through a different log function.
+        
+        The returned fetcher shares this one's session, rate limiter and cache,
+        so it can be used alongside it from another thread.
+        
+        Args:
+            log: Function called with each progress or error message
+            
+        Returns:
+            Shallow copy of this fetcher using ``log``
+        """
+        fetcher = copy.copy(self)
+        fetcher.log = log
+        return fetcher
+    
     def search_pubmed(self, query: str, max_results: int = None) -> List[str]:
         """
         Search PubMed for papers matching the query.
@@ -81,24 +428,43 @@ class PubMedFetcher:
         Returns:
             List of PubMed IDs
         """
+        return self._search(query, max_results)['pmids']
+    
+    def _search(self, query: str, max_results: int = None) -> Dict:
+        """
+        Search PubMed and keep the result set on the NCBI history server.
+        
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to retrieve
+            
+        Returns:
+            Dictionary with the PubMed IDs and the history server WebEnv/QueryKey
+        """
         if max_results is None:
             max_results = SEARCH_CONFIG['default_max_results']
             
-        print(f"Searching PubMed for: '{query}'")
+        self.log(f"Searching PubMed for: '{query}'")
         
         try:
             # Search PubMed
-            handle = Entrez.esearch(db="pubmed", term=query, retmax=max_results, sort="relevance")
+            self.rate_limiter.wait()
+            handle = Entrez.esearch(db="pubmed", term=query, retmax=max_results,
+                                    sort="relevance", usehistory="y")
             record = Entrez.read(handle)
             handle.close()
             
             pmids = record["IdList"]
-            print(f"Found {len(pmids)} papers")
-            return pmids
+            self.log(f"Found {len(pmids)} papers")
+            return {
+                'pmids': pmids,
+                'webenv': record.get('WebEnv'),
+                'query_key': record.get('QueryKey')
+            }
             
         except Exception as e:
-            print(f"Error searching PubMed: {e}")
-            return []
+            self.log(f"Error searching PubMed: {e}")
+            return {'pmids': [], 'webenv': None, 'query_key': None}
     
     def has_pharma_affiliation(self, affiliation: str) -> bool:
         """
@@ -113,96 +479,381 @@ class PubMedFetcher:
         if not affiliation:
             return False
             
-        affiliation_lower = affiliation.lower()
+        return self._affiliation_matcher()(affiliation.lower())
+    
+    def get_paper_details(self, pmid: str) -> Optional[Dict]:
+        """
+        Get detailed information for a specific paper.
         
-        # Check for company names
-        for company in self.company_keywords:
-            if company in affiliation_lower:
-                return True
+        Args:
+            pmid: PubMed ID
+            
+        Returns:
+            Dictionary containing paper details or None if error
+        """
+        papers = self.get_papers_details_batch([pmid])
+        return papers[0] if papers else None
+    
+    def get_papers_details_batch(self, pmids: List[str], batch_size: int = None) -> List[Dict]:
+        """
+        Get detailed information for many papers using batched EFetch requests.
         
-        # Check for pharmaceutical/biotech keywords
-        for keyword in self.pharma_keywords:
-            if keyword in affiliation_lower:
-                return True
+        Papers already in the local cache are not fetched again. Lists larger
+        than one batch are uploaded with EPost so that EFetch can page through
+        them on the history server instead of resending the IDs.
         
-        # Check for collaboration keywords
-        for keyword in self.collaboration_keywords:
-            if keyword in affiliation_lower:
-                return True
+        Args:
+            pmids: List of PubMed IDs
+            batch_size: Number of PMIDs to request per EFetch call
+            
+        Returns:
+            List of dictionaries containing paper details
+        """
+        return [paper for batch_papers in self._iter_paper_batches(pmids, batch_size=batch_size)
+                for paper in batch_papers]
+    
+    def _iter_paper_batches(self, pmids: List[str], webenv: str = None, query_key: str = None,
+                            batch_size: int = None) -> Iterator[List[Dict]]:
+        """
+        Yield paper details for the given PMIDs, serving cached papers first and
+        fetching only the missing ones from NCBI.
         
-        # Check for academic-industry collaboration keywords
-        for keyword in self.academic_industry_keywords:
-            if keyword in affiliation_lower:
-                return True
+        Args:
+            pmids: List of PubMed IDs
+            webenv: Optional WebEnv holding exactly these PMIDs on the history server
+            query_key: Optional QueryKey holding exactly these PMIDs on the history server
+            batch_size: Number of PMIDs to request per EFetch call
+            
+        Yields:
+            List of dictionaries containing paper details for one batch
+        """
+        cached_papers, missing = self._load_cached(pmids)
+        if cached_papers:
+            yield cached_papers
         
-        return False
+        if not missing:
+            return
+        
+        # The history server result set is only usable if nothing was cached
+        if len(missing) != len(pmids):
+            webenv = query_key = None
+        
+        yield from self._iter_batches(self._plan_batches(missing, webenv, query_key, batch_size))
     
-    def get_paper_details(self, pmid: str) -> Optional[Dict]:
+    def _iter_prefiltered_batches(self, pmids: List[str], webenv: str = None, query_key: str = None,
+                                  batch_size: int = None) -> Iterator[List[Dict]]:
         """
-        Get detailed information for a specific paper.
+        Yield paper details only for PMIDs with pharma/biotech affiliations.
+        
+        Uncached papers are first fetched in the compact MEDLINE text format and
+        screened on their affiliation (AD) fields; full XML records are then
+        fetched only for the papers that pass. Screened affiliations are cached
+        too and re-checked against the current keywords, so papers screened out
+        on an earlier run are not downloaded again.
         
         Args:
-            pmid: PubMed ID
+            pmids: List of PubMed IDs
+            webenv: Optional WebEnv holding exactly these PMIDs on the history server
+            query_key: Optional QueryKey holding exactly these PMIDs on the history server
+            batch_size: Number of PMIDs to request per EFetch call
+            
+        Yields:
+            List of dictionaries containing paper details for one batch
+        """
+        cached_papers, missing = self._load_cached(pmids)
+        if cached_papers:
+            yield cached_papers
+        
+        if not missing:
+            return
+        
+        affiliations_by_pmid, unscreened = self._load_screened(missing)
+        
+        if unscreened:
+            if len(unscreened) != len(pmids):
+                webenv = query_key = None
+            
+            screening_batches = self._plan_batches(unscreened, webenv, query_key, batch_size)
+            for batch_affiliations in self._iter_batches(screening_batches, self._efetch_affiliations):
+                affiliations_by_pmid.update(batch_affiliations)
+                if self.cache is not None and batch_affiliations:
+                    self.cache.put_affiliations(batch_affiliations)
+        
+        matches = self._affiliation_matcher()
+        survivors = [
+            pmid for pmid in missing
+            if any(matches(aff.lower()) for aff in dict.fromkeys(affiliations_by_pmid.get(pmid, ())) if aff)
+        ]
+        self.log(f"{len(survivors)} of {len(missing)} papers have pharma/biotech affiliations; fetching full records")
+        
+        if survivors:
+            yield from self._iter_batches(self._plan_batches(survivors, batch_size=batch_size))
+    
+    def _load_cached(self, pmids: List[str]) -> Tuple[List[Dict], List[str]]:
+        """
+        Parse papers available in the local cache.
+        
+        Args:
+            pmids: List of PubMed IDs
             
         Returns:
-            Dictionary containing paper details or None if error
+            Tuple of (cached paper details, PMIDs to fetch). PMIDs whose cached
+            record cannot be parsed count as missing, so fetching them again
+            replaces the bad entry.
+        """
+        if self.cache is None:
+            return [], pmids
+        
+        cached = self.cache.get_many(pmids)
+        if not cached:
+            return [], pmids
+        
+        papers = []
+        missing = []
+        for pmid in pmids:
+            paper = None
+            if pmid in cached:
+                try:
+                    paper = self._parse_article(etree.fromstring(cached[pmid]))
+                except etree.XMLSyntaxError as e:
+                    self.log(f"Ignoring unreadable cache entry for PMID {pmid}: {e}")
+            if paper:
+                papers.append(paper)
+            else:
+                missing.append(pmid)
+        
+        if papers:
+            self.log(f"Loaded {len(papers)} papers from cache")
+        return papers, missing
+    
+    def _load_screened(self, pmids: List[str]) -> Tuple[Dict[str, List[str]], List[str]]:
+        """
+        Look up affiliations already screened by the prefilter on earlier runs.
+        
+        Args:
+            pmids: List of PubMed IDs
+            
+        Returns:
+            Tuple of (cached affiliations by PMID, PMIDs not screened yet)
+        """
+        if self.cache is None:
+            return {}, pmids
+        
+        screened = self.cache.get_affiliations(pmids)
+        if screened:
+            self.log(f"Loaded affiliations of {len(screened)} papers from cache")
+        return screened, [pmid for pmid in pmids if pmid not in screened]
+    
+    def _plan_batches(self, pmids: List[str], webenv: str = None, query_key: str = None,
+                      batch_size: int = None) -> List[Tuple[str, Dict]]:
         """
+        Choose how to request the given PMIDs: from an existing history server
+        result set, via EPost for long lists, or directly by ID.
+        """
+        if batch_size is None:
+            batch_size = SEARCH_CONFIG.get('efetch_batch_size', 200)
+        
+        batches = None
+        if webenv and query_key:
+            batches = self._history_batches(webenv, query_key, len(pmids), batch_size)
+        elif len(pmids) > batch_size:
+            batches = self._post_batches(pmids, batch_size)
+        if batches is None:
+            batches = self._pmid_batches(pmids, batch_size)
+        
+        return batches
+    
+    def _post_batches(self, pmids: List[str], batch_size: int = None) -> Optional[List[Tuple[str, Dict]]]:
+        """Upload PMIDs with EPost and return history server EFetch batches, or None on error."""
         try:
-            # Fetch paper details using XML format
-            handle = Entrez.efetch(db="pubmed", id=pmid, rettype="xml", retmode="xml")
+            self.rate_limiter.wait()
+            handle = Entrez.epost(db="pubmed", id=",".join(pmids))
             record = Entrez.read(handle)
             handle.close()
+        except Exception as e:
+            self.log(f"Error posting PMIDs to history server: {e}")
+            return None
+        
+        return self._history_batches(record['WebEnv'], record['QueryKey'], len(pmids), batch_size)
+    
+    def _pmid_batches(self, pmids: List[str], batch_size: int = None) -> List[Tuple[str, Dict]]:
+        """Split PMIDs into EFetch batches requested by ID."""
+        if batch_size is None:
+            batch_size = SEARCH_CONFIG.get('efetch_batch_size', 200)
+        
+        batches = []
+        pmid_iter = iter(pmids)
+        
+        while True:
+            batch = list(islice(pmid_iter, batch_size))
+            if not batch:
+                break
+            batches.append((f"PMIDs {batch[0]}-{batch[-1]}", {'id': ",".join(batch)}))
+        
+        return batches
+    
+    def _history_batches(self, webenv: str, query_key: str, count: int,
+                         batch_size: int = None) -> List[Tuple[str, Dict]]:
+        """Split a history server result set into EFetch batches requested by position."""
+        if batch_size is None:
+            batch_size = SEARCH_CONFIG.get('efetch_batch_size', 200)
+        
+        return [
+            (f"records {start + 1}-{min(start + batch_size, count)}",
+             {'webenv': webenv, 'query_key': query_key,
+              'retstart': start, 'retmax': min(batch_size, count - start)})
+            for start in range(0, count, batch_size)
+        ]
+    
+    def _iter_batches(self, batches: List[Tuple[str, Dict]], fetch=None) -> Iterator:
+        """
+        Run EFetch batches concurrently, yielding each batch's result in batch order.
+        
+        Args:
+            batches: List of (description, EFetch parameters) tuples
+            fetch: Function run for each batch (defaults to fetching full paper details)
             
-            if not record:
-                return None
+        Yields:
+            Result of ``fetch`` for one batch
+        """
+        if fetch is None:
+            fetch = self._efetch_articles
+        
+        if len(batches) <= 1 or self.max_workers <= 1:
+            for description, params in batches:
+                yield fetch(description, **params)
+            return
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            yield from executor.map(lambda batch: fetch(batch[0], **batch[1]), batches)
+    
+    def _efetch_affiliations(self, description: str, **params) -> Dict[str, List[str]]:
+        """
+        Run a single EFetch request in MEDLINE text format and extract affiliations.
+        
+        Args:
+            description: Human readable description of the batch (for error messages)
+            **params: Extra EFetch parameters (id, or webenv/query_key/retstart/retmax)
             
-            paper = record['PubmedArticle'][0]['MedlineCitation']['Article']
+        Returns:
+            Dictionary mapping each PMID to its affiliation strings
+        """
+        affiliations = {}
+        
+        try:
+            self.rate_limiter.wait()
+            with self._session.get(
+                EFETCH_URL,
+                params={'db': 'pubmed', 'rettype': 'medline', 'retmode': 'text',
+                        **self._eutils_params, **params},
+                timeout=SEARCH_CONFIG.get('timeout', 30)
+            ) as response:
+                response.raise_for_status()
+                text = response.text
+            
+            pmid = None
+            for tag, value in MEDLINE_FIELD_RE.findall(text):
+                if tag == 'PMID':
+                    pmid = value.strip()
+                    affiliations[pmid] = []
+                elif pmid is not None:
+                    affiliations[pmid].append(MEDLINE_CONTINUATION_RE.sub(' ', value))
+            
+        except Exception as e:
+            self.log(f"Error fetching affiliations for {description}: {e}")
+        
+        return affiliations
+    
+    def _efetch_articles(self, description: str, **params) -> List[Dict]:
+        """
+        Run a single EFetch request and parse every article it returns.
+        
+        Args:
+            description: Human readable description of the batch (for error messages)
+            **params: Extra EFetch parameters (id, or webenv/query_key/retstart/retmax)
+            
+        Returns:
+            List of dictionaries containing paper details
+        """
+        papers = []
+        raw_articles = []
+        
+        try:
+            # Fetch the whole batch in a single round-trip
+            self.rate_limiter.wait()
+            # The context manager releases the streamed connection back to the
+            # pool even if the request fails or the XML is malformed
+            with self._session.get(
+                EFETCH_URL,
+                params={'db': 'pubmed', 'rettype': 'xml', 'retmode': 'xml', **self._eutils_params, **params},
+                timeout=SEARCH_CONFIG.get('timeout', 30),
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                
+                # Stream the response instead of building the whole DOM with Entrez.read
+                for _, elem in etree.iterparse(response.raw, tag='PubmedArticle'):
+                    paper_details = self._parse_article(elem)
+                    if paper_details:
+                        papers.append(paper_details)
+                        if self.cache is not None:
+                            raw_articles.append((paper_details['pmid'], etree.tostring(elem, with_tail=False)))
+                    
+                    # Free the parsed article and any siblings already processed
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+            
+            if raw_articles:
+                self.cache.put_many(raw_articles)
+            
+        except Exception as e:
+            self.log(f"Error fetching details for {description}: {e}")
+        
+        return papers
+    
+    def _parse_article(self, article) -> Optional[Dict]:
+        """
+        Extract paper details from a single PubmedArticle record.
+        
+        Args:
+            article: PubmedArticle XML element
+            
+        Returns:
+            Dictionary containing paper details or None if error
+        """
+        try:
+            pmid = PMID_XP(article)
             
             # Extract basic information
-            title = paper.get('ArticleTitle', '')
-            abstract = ''
-            if 'Abstract' in paper and 'AbstractText' in paper['Abstract']:
-                abstract_texts = paper['Abstract']['AbstractText']
-                if isinstance(abstract_texts, list):
-                    abstract = ' '.join(abstract_texts)
-                else:
-                    abstract = str(abstract_texts)
+            title = TITLE_XP(article)
+            abstract = ' '.join(_element_text(text) for text in ABSTRACT_XP(article))
             
-            journal = paper.get('Journal', {}).get('Title', '')
-            pub_date = ''
-            if 'Journal' in paper and 'JournalIssue' in paper['Journal']:
-                pub_info = paper['Journal']['JournalIssue'].get('PubDate', {})
-                year = pub_info.get('Year', '')
-                month = pub_info.get('Month', '')
-                day = pub_info.get('Day', '')
-                pub_date = f"{year} {month} {day}".strip()
+            journal = JOURNAL_XP(article)
+            pub_date = ' '.join(
+                part for part in (YEAR_XP(article), MONTH_XP(article), DAY_XP(article)) if part
+            )
             
             # Extract authors and affiliations
             authors = []
-            affiliations = []
-            has_pharma_author = False
-            
-            if 'AuthorList' in paper:
-                for author in paper['AuthorList']:
-                    if 'LastName' in author and 'ForeName' in author:
-                        author_name = f"{author['ForeName']} {author['LastName']}"
-                        authors.append(author_name)
-                    
-                    # Check for affiliations
-                    if 'AffiliationInfo' in author:
-                        for aff_info in author['AffiliationInfo']:
-                            if 'Affiliation' in aff_info:
-                                affiliation = aff_info['Affiliation']
-                                affiliations.append(affiliation)
-                                if self.has_pharma_affiliation(affiliation):
-                                    has_pharma_author = True
-            
-            # Also check for general affiliations in the article
-            if 'Affiliation' in paper:
-                for affiliation in paper['Affiliation']:
-                    affiliations.append(affiliation)
-                    if self.has_pharma_affiliation(affiliation):
-                        has_pharma_author = True
+            for author in AUTHOR_XP(article):
+                last_name = LAST_NAME_XP(author)
+                fore_name = FORE_NAME_XP(author)
+                if last_name and fore_name:
+                    authors.append(f"{fore_name} {last_name}")
+            
+            # Author affiliations, then any general affiliations in the article
+            affiliations = [_element_text(aff) for aff in AUTHOR_AFFILIATION_XP(article)]
+            affiliations += [_element_text(aff) for aff in ARTICLE_AFFILIATION_XP(article)]
+            
+            # Co-authors often share an institution, so check each distinct
+            # affiliation once and stop at the first pharma/biotech hit
+            matches = self._affiliation_matcher()
+            has_pharma_author = any(
+                matches(affiliation.lower())
+                for affiliation in dict.fromkeys(affiliations) if affiliation
+            )
             
             # Truncate long fields if configured
             if OUTPUT_CONFIG.get('truncate_long_fields', True):
@@ -224,7 +875,7 @@ class PubMedFetcher:
             }
             
         except Exception as e:
-            print(f"Error fetching details for PMID {pmid}: {e}")
+            self.log(f"Error parsing paper details: {e}")
             return None
     
     def fetch_and_filter_papers(self, query: str, max_results: int = None) -> List[Dict]:
@@ -238,59 +889,68 @@ class PubMedFetcher:
         Returns:
             List of papers with pharma/biotech affiliations
         """
-        pmids = self.search_pubmed(query, max_results)
+        return list(self.iter_filtered_papers(query, max_results))
+    
+    def iter_filtered_papers(self, query: str, max_results: int = None) -> Iterator[Dict]:
+        """
+        Fetch papers and yield those with pharmaceutical/biotech affiliations as each
+        EFetch batch is parsed, so callers can stream results without holding them all.
+        
+        Args:
+            query: Search query
+            max_results: Maximum number of results to process
+            
+        Yields:
+            Papers with pharma/biotech affiliations
+        """
+        search = self._search(query, max_results)
+        pmids = search['pmids']
         
         if not pmids:
-            return []
+            return
         
-        filtered_papers = []
-        print(f"Processing {len(pmids)} papers...")
+        found = 0
+        self.log(f"Processing {len(pmids)} papers...")
         
-        for i, pmid in enumerate(pmids, 1):
-            print(f"Processing paper {i}/{len(pmids)} (PMID: {pmid})")
-            
-            paper_details = self.get_paper_details(pmid)
-            
-            if paper_details and paper_details['has_pharma_affiliation']:
-                filtered_papers.append(paper_details)
-                print(f"  ✓ Found pharma/biotech affiliation")
-            else:
-                print(f"  ✗ No pharma/biotech affiliation found")
-            
-            # Be respectful to NCBI servers
-            time.sleep(SEARCH_CONFIG.get('rate_limit_delay', 0.1))
+        if SEARCH_CONFIG.get('prefilter_affiliations', True):
+            batches = self._iter_prefiltered_batches(pmids, search['webenv'], search['query_key'])
+        else:
+            batches = self._iter_paper_batches(pmids, search['webenv'], search['query_key'])
         
-        print(f"\nFound {len(filtered_papers)} papers with pharmaceutical/biotech affiliations")
-        return filtered_papers
+        for batch_papers in batches:
+            for paper_details in batch_papers:
+                if paper_details['has_pharma_affiliation']:
+                    found += 1
+                    self.log(f"  ✓ PMID {paper_details['pmid']}: found pharma/biotech affiliation")
+                    yield paper_details
+                else:
+                    self.log(f"  ✗ PMID {paper_details['pmid']}: no pharma/biotech affiliation found")
+        
+        self.log(f"\nFound {found} papers with pharmaceutical/biotech affiliations")
     
-    def export_to_csv(self, papers: List[Dict], output_file: str):
+    def export_to_csv(self, papers: Iterable[Dict], output_file: str) -> int:
         """
-        Export papers to CSV file.
+        Export papers to CSV file, writing each paper as it arrives.
         
         Args:
-            papers: List of paper dictionaries
+            papers: List or iterator of paper dictionaries
             output_file: Output CSV filename
+            
+        Returns:
+            Number of papers exported
         """
-        if not papers:
-            print("No papers to export")
-            return
-        
         try:
-            df = pd.DataFrame(papers)
-            
-            # Reorder columns for better readability
-            columns = ['pmid', 'title', 'authors', 'journal', 'publication_date', 
-                      'affiliations', 'abstract', 'has_pharma_affiliation']
-            # Only include columns that exist in the dataframe
-            available_columns = [col for col in columns if col in df.columns]
-            df = df[available_columns]
-            
-            df.to_csv(output_file, index=False, quoting=csv.QUOTE_ALL, 
-                     encoding=OUTPUT_CONFIG.get('csv_encoding', 'utf-8'))
-            print(f"Exported {len(papers)} papers to {output_file}")
-            
+            count = write_papers_csv(papers, output_file, PAPER_COLUMNS,
+                                     encoding=OUTPUT_CONFIG.get('csv_encoding', 'utf-8'))
         except Exception as e:
-            print(f"Error exporting to CSV: {e}")
+            self.log(f"Error exporting to CSV: {e}")
+            return 0
+        
+        if count:
+            self.log(f"Exported {count} papers to {output_file}")
+        else:
+            self.log("No papers to export")
+        return count
 
 
 def main():
@@ -318,6 +978,12 @@ Examples:
         help='Email address for NCBI E-utilities (required by NCBI)'
     )
     
+    parser.add_argument(
+        '-k', '--api-key',
+        default=os.environ.get('NCBI_API_KEY'),
+        help='NCBI API key for higher rate limits (default: $NCBI_API_KEY)'
+    )
+    
     parser.add_argument(
         '-o', '--output',
         default=OUTPUT_CONFIG.get('default_filename', 'pubmed_results.csv'),
@@ -331,6 +997,12 @@ Examples:
         help=f'Maximum number of results to process (default: {SEARCH_CONFIG.get("default_max_results", 100)})'
     )
     
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the local paper cache'
+    )
+    
     args = parser.parse_args()
     
     # Validate email format
@@ -340,20 +1012,22 @@ Examples:
         sys.exit(1)
     
     # Create fetcher and process
-    fetcher = PubMedFetcher(args.email)
+    cache_file = None if args.no_cache else SEARCH_CONFIG.get('cache_file')
+    fetcher = PubMedFetcher(args.email, args.api_key, cache_file)
     
     print("=" * 60)
     print("PubMed Research Paper Fetcher")
     print("Filtering for Pharmaceutical/Biotech Affiliations")
     print("=" * 60)
     
-    papers = fetcher.fetch_and_filter_papers(args.query, args.max_results)
+    # Papers are written to the CSV as they are fetched
+    papers = fetcher.iter_filtered_papers(args.query, args.max_results)
+    exported = fetcher.export_to_csv(papers, args.output)
     
-    if papers:
-        fetcher.export_to_csv(papers, args.output)
+    if exported:
         print(f"\nSummary:")
         print(f"- Total papers processed: {args.max_results}")
-        print(f"- Papers with pharma/biotech affiliations: {len(papers)}")
+        print(f"- Papers with pharma/biotech affiliations: {exported}")
         print(f"- Results saved to: {args.output}")
     else:
         print("\nNo papers with pharmaceutical/biotech affiliations found.")
@@ -5,91 +5,38 @@ Setup script for PubMed Research Paper Fetcher
 This script helps users set up the environment and test the installation.
 """
 
+import functools
+import hashlib
 import subprocess
 import sys
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
-def run_command(command, description):
-    """Run a command and handle errors."""
-    print(f"\n{description}...")
-    try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
-        print(f"✓ {description} completed successfully")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"✗ {description} failed:")
-        print(f"  Error: {e.stderr}")
-        return False
+# Separator line used in setup section headers
+_SEP = "=" * 60
 
+# Modules required at runtime, mapped to the distributions that provide them
+PROBES = {
+    'requests': 'requests',
+    'Bio': 'biopython',
+    'lxml': 'lxml',
+}
 
-def check_python_version():
-    """Check if Python version is compatible."""
-    print("Checking Python version...")
-    version = sys.version_info
-    if version.major < 3 or (version.major == 3 and version.minor < 7):
-        print(f"✗ Python 3.7 or higher is required. Current version: {version.major}.{version.minor}")
-        return False
-    else:
-        print(f"✓ Python version {version.major}.{version.minor}.{version.micro} is compatible")
-        return True
+# Records the hash of the last successfully installed requirements.txt,
+# together with the interpreter and environment it was installed into
+DEPS_STAMP = '.deps.stamp'
 
+# Distribution name at the start of a requirements.txt line
+REQUIREMENT_NAME_RE = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]*')
 
-def install_dependencies():
-    """Install required dependencies."""
-    print("\nInstalling dependencies...")
-    
-    # Check if requirements.txt exists
-    if not os.path.exists('requirements.txt'):
-        print("✗ requirements.txt not found")
-        return False
-    
-    # Install dependencies
-    success = run_command(
-        f"{sys.executable} -m pip install -r requirements.txt",
-        "Installing Python dependencies"
-    )
-    
-    return success
-
+# Persistent pip cache so repeated setup runs reuse downloaded wheels
+PIP_CACHE_DIR = Path.home() / '.cache' / 'pubmed-fetcher-pip'
 
-def test_imports():
-    """Test if all required modules can be imported."""
-    print("\nTesting imports...")
-    
-    required_modules = [
-        'requests',
-        'pandas', 
-        'Bio',
-        'argparse'
-    ]
-    
-    failed_imports = []
-    
-    for module in required_modules:
-        try:
-            __import__(module)
-            print(f"✓ {module} imported successfully")
-        except ImportError as e:
-            print(f"✗ Failed to import {module}: {e}")
-            failed_imports.append(module)
-    
-    if failed_imports:
-        print(f"\n✗ Failed to import: {', '.join(failed_imports)}")
-        return False
-    else:
-        print("\n✓ All required modules imported successfully")
-        return True
-
-
-def create_sample_files():
-    """Create sample files for testing."""
-    print("\nCreating sample files...")
-    
-    # Create sample queries file if it doesn't exist
-    if not os.path.exists('sample_queries.txt'):
-        sample_queries = """# Sample queries for PubMed Research Paper Fetcher
+# Contents of the sample files created by create_sample_files()
+SAMPLE_QUERIES = b"""# Sample queries for PubMed Research Paper Fetcher
 # Lines starting with # are comments and will be ignored
 # One query per line
 
@@ -98,14 +45,8 @@ diabetes treatment
 COVID-19 vaccine
 Alzheimer's disease
 breast cancer"""
-        
-        with open('sample_queries.txt', 'w') as f:
-            f.write(sample_queries)
-        print("✓ Created sample_queries.txt")
-    
-    # Create .gitignore if it doesn't exist
-    if not os.path.exists('.gitignore'):
-        gitignore_content = """# Python
+
+GITIGNORE = b"""# Python
 __pycache__/
 *.py[cod]
 *$py.class
@@ -148,57 +89,298 @@ Thumbs.db
 test_results.csv
 batch_results_*.csv
 pubmed_results.csv
+.pubmed_cache.db
+.deps.stamp
+"""
+
+
+# Printed in a single write once setup has finished
+USAGE_BANNER = """
+============================================================
+SETUP COMPLETED SUCCESSFULLY!
+============================================================
+
+USAGE EXAMPLES:
+------------------------------
+
+1. Basic usage:
+   python pubmed_fetcher.py -q "cancer immunotherapy" -e "your.email@example.com"
+
+2. With custom output file:
+   python pubmed_fetcher.py -q "diabetes treatment" -e "researcher@university.edu" -o results.csv
+
+3. Limited results:
+   python pubmed_fetcher.py -q "COVID-19 vaccine" -e "scientist@company.com" -m 25
+
+4. Batch processing from file:
+   python batch_processor.py -f sample_queries.txt -e "your.email@example.com"
+
+5. Batch processing with specific queries:
+   python batch_processor.py -q "cancer immunotherapy" "diabetes treatment" -e "researcher@university.edu"
+
+6. Test the installation:
+   python test_pubmed_fetcher.py
+
+IMPORTANT NOTES:
+------------------------------
+• You must provide a valid email address for NCBI E-utilities
+• The tool respects NCBI's rate limits (3 requests/second, 10 with an API key)
+• Results are saved as CSV files
+• You can customize keywords and settings in config.py
+
+For more information, see README.md
 """
+
+
+def run_command(command, description):
+    """Run a command (given as an argument list, without a shell), streaming its output."""
+    print(f"\n{description}...")
+    try:
+        # Echo output line by line instead of buffering the whole log in memory
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              text=True, bufsize=1) as proc:
+            for line in proc.stdout:
+                sys.stdout.write(line)
+            proc.wait()
+    except OSError as e:
+        print(f"✗ {description} failed:")
+        print(f"  Error: {e}")
+        return False
+    
+    if proc.returncode != 0:
+        print(f"✗ {description} failed (exit code {proc.returncode})")
+        return False
+    
+    print(f"✓ {description} completed successfully")
+    return True
+
+
+def check_python_version():
+    """Check if Python version is compatible."""
+    print("Checking Python version...")
+    major, minor, micro, *_ = sys.version_info
+    if sys.version_info < (3, 8):
+        print(f"✗ Python 3.8 or higher is required. Current version: {major}.{minor}")
+        return False
+    else:
+        print(f"✓ Python version {major}.{minor}.{micro} is compatible")
+        return True
+
+
+def requirement_names(requirements):
+    """
+    List the distribution names in a requirements file.
+    
+    Args:
+        requirements: Contents of a requirements.txt file
         
-        with open('.gitignore', 'w') as f:
-            f.write(gitignore_content)
-        print("✓ Created .gitignore")
+    Returns:
+        Names of the listed distributions, skipping comments and option lines
+    """
+    names = []
+    for line in requirements.splitlines():
+        line = line.split('#', 1)[0].strip()
+        match = REQUIREMENT_NAME_RE.match(line)
+        if match:
+            names.append(match.group())
+    return names
+
+
+def requirements_satisfied(requirements):
+    """
+    Check whether installed distributions already satisfy a requirements file.
+    
+    Args:
+        requirements: Contents of a requirements.txt file
+        
+    Returns:
+        True if every requirement is installed at an acceptable version
+    """
+    # Imported lazily: importlib.metadata needs Python 3.8, and importing it at
+    # module level would fail before check_python_version() can report that
+    import importlib.metadata
+    
+    try:
+        from packaging.requirements import Requirement
+        from packaging.version import Version
+    except ImportError:
+        try:
+            # Plain virtualenvs rarely have packaging itself, but pip vendors it
+            from pip._vendor.packaging.requirements import Requirement
+            from pip._vendor.packaging.version import Version
+        except ImportError:
+            # Without packaging we cannot compare versions; let pip decide
+            return False
+    
+    for line in requirements.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith('-'):
+            # Options such as -r/-e point at requirements we cannot check here
+            return False
+        
+        try:
+            req = Requirement(line)
+            if req.marker is not None and not req.marker.evaluate():
+                continue
+            installed = importlib.metadata.version(req.name)
+            if not req.specifier.contains(Version(installed), prereleases=True):
+                return False
+        except Exception:
+            return False
     
     return True
 
 
-def print_usage_examples():
-    """Print usage examples."""
-    print("\n" + "="*60)
-    print("SETUP COMPLETED SUCCESSFULLY!")
-    print("="*60)
+def install_dependencies(cwd, present):
+    """
+    Install required dependencies.
+    
+    Args:
+        cwd: Resolved project directory
+        present: Names of the entries in the project directory
+    """
+    print("\nInstalling dependencies...")
+    
+    # Check if requirements.txt exists
+    if 'requirements.txt' not in present:
+        print("✗ requirements.txt not found")
+        return False
+    
+    requirements_file = cwd / 'requirements.txt'
+    stamp_file = cwd / DEPS_STAMP
+    
+    # Skip pip entirely if these exact requirements were already installed
+    # into this interpreter's environment
+    requirements = requirements_file.read_bytes()
+    digest = hashlib.sha256(
+        b'\0'.join([requirements, os.fsencode(sys.executable), os.fsencode(sys.prefix)])
+    ).hexdigest()
+    if DEPS_STAMP in present:
+        with stamp_file.open() as f:
+            stamp_matches = f.read().strip() == digest
+        # A package may have been uninstalled since the stamp was written
+        if stamp_matches and all(map(has_distribution, requirement_names(requirements.decode('utf-8')))):
+            print("✓ Dependencies already installed for this requirements.txt and environment")
+            return True
+    
+    # ...or if every requirement is already met by the installed packages
+    if requirements_satisfied(requirements.decode('utf-8')):
+        print("✓ Dependencies already satisfied")
+        stamp_file.write_text(digest)
+        return True
+    
+    # Install dependencies, reusing previously downloaded wheels
+    success = run_command(
+        [sys.executable, '-m', 'pip', 'install',
+         '--disable-pip-version-check', '--no-input', '--quiet', '--prefer-binary',
+         '--cache-dir', str(PIP_CACHE_DIR), '-r', str(requirements_file)],
+        "Installing Python dependencies"
+    )
+    
+    if success:
+        stamp_file.write_text(digest)
+    
+    return success
+
+
+def has_distribution(name):
+    """
+    Check whether a distribution is installed without importing it.
     
-    print("\nUSAGE EXAMPLES:")
-    print("-" * 30)
+    Args:
+        name: Distribution name as published on PyPI
+        
+    Returns:
+        True if the distribution's metadata is present
+    """
+    # Imported lazily; see requirements_satisfied()
+    import importlib.metadata
     
-    print("\n1. Basic usage:")
-    print("   python pubmed_fetcher.py -q \"cancer immunotherapy\" -e \"your.email@example.com\"")
+    try:
+        importlib.metadata.distribution(name)
+    except importlib.metadata.PackageNotFoundError:
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def test_imports():
+    """Test if all required modules can be imported."""
+    print("\nTesting imports...")
     
-    print("\n2. With custom output file:")
-    print("   python pubmed_fetcher.py -q \"diabetes treatment\" -e \"researcher@university.edu\" -o results.csv")
+    failed_imports = []
+    
+    # The lookups are independent metadata reads, so run them side by side
+    with ThreadPoolExecutor(max_workers=len(PROBES)) as executor:
+        found = list(executor.map(has_distribution, PROBES.values()))
     
-    print("\n3. Limited results:")
-    print("   python pubmed_fetcher.py -q \"COVID-19 vaccine\" -e \"scientist@company.com\" -m 25")
+    for module, available in zip(PROBES, found):
+        if not available:
+            print(f"✗ Failed to find {module}")
+            failed_imports.append(module)
+        else:
+            print(f"✓ {module} is available")
+    
+    if failed_imports:
+        print(f"\n✗ Failed to import: {', '.join(failed_imports)}")
+        return False
+    else:
+        print("\n✓ All required modules are available")
+        return True
+
+
+def _create_file(path, content):
+    """
+    Atomically create a file with the given content, leaving existing files alone.
     
-    print("\n4. Batch processing from file:")
-    print("   python batch_processor.py -f sample_queries.txt -e \"your.email@example.com\"")
+    Returns:
+        True if the file was created, False if it already existed
+    """
+    try:
+        with path.open('xb') as f:
+            f.write(content)
+    except FileExistsError:
+        return False
+    return True
+
+
+def create_sample_files(cwd):
+    """
+    Create sample files for testing.
     
-    print("\n5. Batch processing with specific queries:")
-    print("   python batch_processor.py -q \"cancer immunotherapy\" \"diabetes treatment\" -e \"researcher@university.edu\"")
+    Args:
+        cwd: Resolved project directory
+    """
+    print("\nCreating sample files...")
     
-    print("\n6. Test the installation:")
-    print("   python test_pubmed_fetcher.py")
+    # Create sample queries file if it doesn't exist
+    if _create_file(cwd / 'sample_queries.txt', SAMPLE_QUERIES):
+        print("✓ Created sample_queries.txt")
     
-    print("\nIMPORTANT NOTES:")
-    print("-" * 30)
-    print("• You must provide a valid email address for NCBI E-utilities")
-    print("• The tool respects NCBI's rate limits (0.1 second delay between requests)")
-    print("• Results are saved as CSV files")
-    print("• You can customize keywords and settings in config.py")
+    # Create .gitignore if it doesn't exist
+    if _create_file(cwd / '.gitignore', GITIGNORE):
+        print("✓ Created .gitignore")
     
-    print("\nFor more information, see README.md")
+    return True
+
+
+def print_usage_examples():
+    """Print usage examples."""
+    sys.stdout.write(USAGE_BANNER)
 
 
 def main():
     """Main setup function."""
-    print("="*60)
-    print("PubMed Research Paper Fetcher - Setup")
-    print("="*60)
+    print(f"{_SEP}\nPubMed Research Paper Fetcher - Setup\n{_SEP}")
+    
+    # Resolve the project directory once and hand absolute paths to the helpers
+    cwd = Path.cwd().resolve()
+    
+    # List the project directory once instead of stat()ing each file
+    with os.scandir(cwd) as entries:
+        present = {entry.name for entry in entries}
     
     # Check Python version
     if not check_python_version():
@@ -206,7 +388,7 @@ def main():
         sys.exit(1)
     
     # Install dependencies
-    if not install_dependencies():
+    if not install_dependencies(cwd, present):
         print("\n✗ Setup failed: Could not install dependencies")
         sys.exit(1)
     
@@ -216,17 +398,20 @@ def main():
         sys.exit(1)
     
     # Create sample files
-    if not create_sample_files():
+    if not create_sample_files(cwd):
         print("\n✗ Setup failed: Could not create sample files")
         sys.exit(1)
     
     # Print usage examples
     print_usage_examples()
     
-    print("\n" + "="*60)
-    print("Setup completed successfully!")
-    print("You can now use the PubMed Research Paper Fetcher.")
-    print("="*60)
+    print("\n".join([
+        "",
+        _SEP,
+        "Setup completed successfully!",
+        "You can now use the PubMed Research Paper Fetcher.",
+        _SEP,
+    ]))
 
 
 if __name__ == "__main__":
@@ -5,9 +5,10 @@ Test script for PubMed Research Paper Fetcher
 This script demonstrates how to use the PubMedFetcher class programmatically.
 """
 
+import importlib
+import json
 import sys
 import os
-from pubmed_fetcher import PubMedFetcher
 
 
 def test_pubmed_fetcher():
@@ -18,6 +19,9 @@ def test_pubmed_fetcher():
     query = "cancer immunotherapy"
     max_results = 10  # Small number for testing
     
+    # Only format papers for a human when someone is watching the terminal
+    verbose = sys.stdout.isatty() and '--quiet' not in sys.argv
+    
     print("Testing PubMed Research Paper Fetcher")
     print("=" * 50)
     print(f"Query: {query}")
@@ -26,6 +30,11 @@ def test_pubmed_fetcher():
     print()
     
     try:
+        # Import lazily so the banner prints before the heavy dependencies load;
+        # reuse the module if it has already been imported in this process
+        mod = sys.modules.get('pubmed_fetcher') or importlib.import_module('pubmed_fetcher')
+        PubMedFetcher = mod.PubMedFetcher
+        
         # Create fetcher instance
         fetcher = PubMedFetcher(email)
         
@@ -33,15 +42,20 @@ def test_pubmed_fetcher():
         papers = fetcher.fetch_and_filter_papers(query, max_results)
         
         if papers:
-            print(f"\nFound {len(papers)} papers with pharmaceutical/biotech affiliations:")
-            print("-" * 50)
-            
-            for i, paper in enumerate(papers, 1):
-                print(f"\n{i}. PMID: {paper['pmid']}")
-                print(f"   Title: {paper['title'][:100]}...")
-                print(f"   Journal: {paper['journal']}")
-                print(f"   Authors: {paper['authors'][:80]}...")
-                print(f"   Date: {paper['publication_date']}")
+            if verbose:
+                print(f"\nFound {len(papers)} papers with pharmaceutical/biotech affiliations:")
+                print("-" * 50)
+                
+                for i, paper in enumerate(papers, 1):
+                    print(f"\n{i}. PMID: {paper['pmid']}")
+                    print(f"   Title: {paper['title'][:100]}...")
+                    print(f"   Journal: {paper['journal']}")
+                    print(f"   Authors: {paper['authors'][:80]}...")
+                    print(f"   Date: {paper['publication_date']}")
+            else:
+                # Redirected output (e.g. CI logs): the CSV is the real artifact,
+                # so a one-line summary is enough
+                print(json.dumps({'count': len(papers), 'pmids': [p['pmid'] for p in papers]}))
             
             # Export to CSV
             output_file = "test_results.csv"